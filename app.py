@@ -1,6 +1,6 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, join_room, leave_room
 import numpy as np
 import torch
 from train_model import EnhancedLSTM
@@ -8,10 +8,19 @@ import joblib
 import json
 from datetime import datetime
 import os
+import time
+from metrics import registry as metrics, profiler
+from risk_rules import (THRESHOLDS, RISK_LEVELS, RISK_STATUS, check_thresholds, analyze_explosion_risk,
+                        determine_risk_level)
+from serialization import (FastJSONProvider, SocketIOJSON, RawJSON, encode_fragment,
+                           dumps_with_fragments, json_response)
+from wire_format import (StructCodec, UnsupportedFormat, wire_format_for, unpack_msgpack, pack_msgpack,
+                         validate_reading, msgpack, JSON_CONTENT_TYPE, MSGPACK_CONTENT_TYPES)
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", json=SocketIOJSON)
 
 # Load the trained model and preprocessing objects
 feature_columns = joblib.load('models/feature_columns.pkl')
@@ -22,102 +31,50 @@ model.eval()
 scaler = joblib.load('models/scaler.pkl')
 city_encoder = joblib.load('models/city_encoder.pkl')
 
-# Define threshold values for different parameters
-THRESHOLDS = {
-    # Original pollutants
-    'Suspended Particles': 0.15,    # mg/m³
-    'Sulfur Dioxide': 0.05,        # mg/m³
-    'Carbon Monoxide': 3.0,        # mg/m³
-    'Nitrogen Dioxide': 0.085,     # mg/m³
-    'Sulfates': 0.025,             # mg/m³
-    
-    # New explosion-related parameters
-    'Methane': 5000,               # ppm
-    'Hydrogen': 4000,              # ppm
-    'Temperature': 60,             # °C
-    'Pressure': 2.0,               # bar
-    'Oxygen_Level': 23.5,          # %
-    'VOC': 100                     # ppm
-}
+# Fixed binary layout for sensor uploads: the training feature order plus any
+# other thresholded parameter
+struct_codec = StructCodec(feature_columns, city_encoder.classes_, THRESHOLDS)
 
-# Define risk levels
-RISK_LEVELS = {
-    'NORMAL': 0,
-    'ATTENTION': 1,
-    'WARNING': 2,
-    'DANGER': 3,
-    'IMMEDIATE_EVAC': 4
+RECOMMENDED_ACTIONS = {
+    RISK_LEVELS['NORMAL']: [
+        "Continue normal monitoring",
+        "Maintain regular safety checks"
+    ],
+    RISK_LEVELS['ATTENTION']: [
+        "Increase monitoring frequency",
+        "Check ventilation systems",
+        "Notify shift supervisor"
+    ],
+    RISK_LEVELS['WARNING']: [
+        "Activate additional ventilation",
+        "Restrict non-essential personnel",
+        "Prepare emergency response team",
+        "Begin equipment safety checks"
+    ],
+    RISK_LEVELS['DANGER']: [
+        "Initiate emergency protocols",
+        "Evacuate non-essential personnel",
+        "Contact emergency response team",
+        "Shutdown non-critical operations"
+    ],
+    RISK_LEVELS['IMMEDIATE_EVAC']: [
+        "IMMEDIATE EVACUATION REQUIRED",
+        "Sound emergency alarms",
+        "Contact emergency services",
+        "Initiate emergency shutdown procedures"
+    ]
 }
 
-# Store the latest sensor data
-latest_sensor_data = None
-
-def get_recommended_actions(risk_level):
-    actions = {
-        RISK_LEVELS['NORMAL']: [
-            "Continue normal monitoring",
-            "Maintain regular safety checks"
-        ],
-        RISK_LEVELS['ATTENTION']: [
-            "Increase monitoring frequency",
-            "Check ventilation systems",
-            "Notify shift supervisor"
-        ],
-        RISK_LEVELS['WARNING']: [
-            "Activate additional ventilation",
-            "Restrict non-essential personnel",
-            "Prepare emergency response team",
-            "Begin equipment safety checks"
-        ],
-        RISK_LEVELS['DANGER']: [
-            "Initiate emergency protocols",
-            "Evacuate non-essential personnel",
-            "Contact emergency response team",
-            "Shutdown non-critical operations"
-        ],
-        RISK_LEVELS['IMMEDIATE_EVAC']: [
-            "IMMEDIATE EVACUATION REQUIRED",
-            "Sound emergency alarms",
-            "Contact emergency services",
-            "Initiate emergency shutdown procedures"
-        ]
-    }
-    return actions.get(risk_level, actions[RISK_LEVELS['NORMAL']])
+# Pre-encoded JSON for the static parts of every sensor response
+RISK_STATUS_FRAGMENTS = {level: encode_fragment(name) for level, name in RISK_STATUS.items()}
+RECOMMENDED_ACTION_FRAGMENTS = {level: encode_fragment(actions) for level, actions in RECOMMENDED_ACTIONS.items()}
 
-def check_thresholds(data):
-    alerts = []
-    for key, value in data.items():
-        if key in THRESHOLDS and value > THRESHOLDS[key]:
-            alerts.append({
-                'parameter': key,
-                'value': value,
-                'threshold': THRESHOLDS[key],
-                'timestamp': datetime.now().isoformat()
-            })
-    return alerts
+# Store the latest sensor data (already encoded as JSON)
+latest_sensor_data = None
 
-def analyze_explosion_risk(data):
-    risks = []
-    
-    # Check for explosive gas mixtures
-    if data.get('Methane', 0) > 0.1 * THRESHOLDS['Methane']:
-        if data.get('Oxygen_Level', 21) > 19.5:  # Sufficient oxygen for combustion
-            risks.append({
-                'type': 'GAS_MIXTURE',
-                'severity': 'HIGH',
-                'description': 'Potentially explosive gas mixture detected'
-            })
-    
-    # Check for temperature-pressure combination
-    if data.get('Temperature', 0) > THRESHOLDS['Temperature'] * 0.8:
-        if data.get('Pressure', 1.0) > THRESHOLDS['Pressure'] * 0.9:
-            risks.append({
-                'type': 'TEMP_PRESSURE',
-                'severity': 'CRITICAL',
-                'description': 'Dangerous temperature-pressure combination'
-            })
-    
-    return risks
+# Socket.IO clients that opted into MessagePack-encoded sensor updates
+MSGPACK_ROOM = 'wire:msgpack'
+msgpack_clients = set()
 
 def prepare_model_input(data):
     # Create a feature vector matching the training data structure
@@ -149,53 +106,78 @@ def prepare_model_input(data):
     feature_array = np.array([[features[col] for col in feature_columns]])
     return feature_array
 
-def determine_risk_level(predictions, alerts, explosion_risks):
-    risk_level = RISK_LEVELS['NORMAL']
-    
-    # Check predictions
-    if predictions['explosion_risk'] > 0.7 or predictions['gas_leak_risk'] > 0.7:
-        risk_level = max(risk_level, RISK_LEVELS['DANGER'])
-    elif predictions['explosion_risk'] > 0.4 or predictions['gas_leak_risk'] > 0.4:
-        risk_level = max(risk_level, RISK_LEVELS['WARNING'])
-    
-    # Check alerts
-    if len(alerts) > 2:
-        risk_level = max(risk_level, RISK_LEVELS['WARNING'])
-    elif len(alerts) > 0:
-        risk_level = max(risk_level, RISK_LEVELS['ATTENTION'])
-    
-    # Check explosion risks
-    for risk in explosion_risks:
-        if risk['severity'] == 'CRITICAL':
-            risk_level = RISK_LEVELS['IMMEDIATE_EVAC']
-        elif risk['severity'] == 'HIGH':
-            risk_level = max(risk_level, RISK_LEVELS['DANGER'])
-    
-    return risk_level
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Use the route pattern rather than the raw path to keep label cardinality bounded
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.count_request(endpoint, request.method, response.status_code)
+    if 'request_start' in g:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start,
+                        endpoint=endpoint, method=request.method)
+    return response
+
+def decode_sensor_payload(wire_format):
+    if wire_format == 'msgpack':
+        data = unpack_msgpack(request.get_data())
+    elif wire_format == 'struct':
+        data = struct_codec.decode(request.get_data())
+    else:
+        data = request.json
+    return validate_reading(data)
+
+def wants_msgpack():
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match([JSON_CONTENT_TYPE, *MSGPACK_CONTENT_TYPES])
+    return best in MSGPACK_CONTENT_TYPES
+
+def get_device_id(data):
+    # Sensors that don't send a device id are grouped by city
+    return metrics.device_label(str(data.get('device_id') or data.get('city') or 'unknown'))
 
 @app.route('/api/sensor-data', methods=['GET', 'POST'])
 def receive_sensor_data():
     global latest_sensor_data
     
     if request.method == 'POST':
-        data = request.json
+        endpoint = request.url_rule.rule
+        parse_start = time.perf_counter()
+        try:
+            wire_format = wire_format_for(request.content_type)
+            data = decode_sensor_payload(wire_format)
+        except UnsupportedFormat as e:
+            return jsonify({'error': str(e)}), 415
+        except ValueError as e:
+            return jsonify({'error': f'Invalid sensor payload: {e}'}), 400
+        device = get_device_id(data)
+        metrics.observe('pipeline_stage_seconds', time.perf_counter() - parse_start,
+                        stage=f'{wire_format}_parse', endpoint=endpoint, device=device)
+        metrics.count_reading(device)
         
         # Prepare data for prediction
-        input_data = prepare_model_input(data)
-        input_scaled = scaler.transform(input_data)
-        input_tensor = torch.FloatTensor(input_scaled)
+        with metrics.time_stage('prepare_model_input', endpoint, device):
+            input_data = prepare_model_input(data)
+        with metrics.time_stage('scaling', endpoint, device):
+            input_scaled = scaler.transform(input_data)
+            input_tensor = torch.FloatTensor(input_scaled)
         
         # Make predictions
-        with torch.no_grad():
-            predictions = model(input_tensor)
-            predictions = {k: v.item() for k, v in predictions.items()}
+        with metrics.time_stage('model_forward', endpoint, device):
+            with torch.no_grad():
+                predictions = model(input_tensor)
+                predictions = {k: v.item() for k, v in predictions.items()}
         
-        # Check for threshold violations and risks
-        alerts = check_thresholds(data.get('pollutants', {}))
-        explosion_risks = analyze_explosion_risk(data.get('explosion_parameters', {}))
-        
-        # Determine overall risk level
-        risk_level = determine_risk_level(predictions, alerts, explosion_risks)
+        with metrics.time_stage('rule_checks', endpoint, device):
+            # Check for threshold violations and risks
+            alerts = check_thresholds(data.get('pollutants', {}))
+            explosion_risks = analyze_explosion_risk(data.get('explosion_parameters', {}))
+            
+            # Determine overall risk level
+            risk_level = determine_risk_level(predictions, alerts, explosion_risks)
         
         # Prepare response
         response = {
@@ -205,22 +187,66 @@ def receive_sensor_data():
             'predictions': predictions,
             'alerts': alerts,
             'explosion_risks': explosion_risks,
-            'risk_level': risk_level,
-            'risk_status': list(RISK_LEVELS.keys())[list(RISK_LEVELS.values()).index(risk_level)],
-            'recommended_actions': get_recommended_actions(risk_level)
+            'risk_level': risk_level
         }
         
+        # Serialize once; risk_status and recommended_actions are spliced in pre-encoded
+        with metrics.time_stage('serialization', endpoint, device):
+            body = dumps_with_fragments(response, {
+                'risk_status': RISK_STATUS_FRAGMENTS[risk_level],
+                'recommended_actions': RECOMMENDED_ACTION_FRAGMENTS[risk_level]
+            })
+        
         # Store the latest data
-        latest_sensor_data = response
+        latest_sensor_data = body
+        
+        # MessagePack is only encoded when someone asked for it
+        # Snapshot the subscribers so a client opting in mid-request can't get a missing payload
+        binary_clients = list(msgpack_clients)
+        packed = None
+        if binary_clients or wants_msgpack():
+            with metrics.time_stage('msgpack_serialization', endpoint, device):
+                packed = pack_msgpack({
+                    **response,
+                    'risk_status': RISK_STATUS[risk_level],
+                    'recommended_actions': RECOMMENDED_ACTIONS[risk_level]
+                })
         
-        # Emit real-time update to connected clients
-        socketio.emit('sensor_update', response)
+        # Emit real-time update to connected clients, reusing the encoded body
+        with metrics.time_stage('emit', endpoint, device):
+            if binary_clients:
+                socketio.emit('sensor_update', RawJSON(body), skip_sid=binary_clients)
+                socketio.emit('sensor_update', packed, to=MSGPACK_ROOM)
+            else:
+                socketio.emit('sensor_update', RawJSON(body))
         
-        return jsonify(response)
+        if packed is not None and wants_msgpack():
+            return app.response_class(packed, mimetype=MSGPACK_CONTENT_TYPES[0])
+        return json_response(body)
     else:  # GET request
         if latest_sensor_data is None:
             return jsonify({'error': 'No sensor data available yet'}), 404
-        return jsonify(latest_sensor_data)
+        return json_response(latest_sensor_data)
+
+@app.route('/api/wire-format', methods=['GET'])
+def get_wire_format():
+    # Lets gateways build fixed-layout binary readings
+    return jsonify(struct_codec.layout())
+
+@socketio.on('set_wire_format')
+def set_wire_format(data):
+    # Clients send {"format": "msgpack"} to receive binary sensor updates, {"format": "json"} to switch back
+    if (data or {}).get('format') == 'msgpack' and msgpack is not None:
+        msgpack_clients.add(request.sid)
+        join_room(MSGPACK_ROOM)
+        return {'format': 'msgpack'}
+    msgpack_clients.discard(request.sid)
+    leave_room(MSGPACK_ROOM)
+    return {'format': 'json'}
+
+@socketio.on('disconnect')
+def handle_disconnect(*args):
+    msgpack_clients.discard(request.sid)
 
 @app.route('/api/thresholds', methods=['GET'])
 def get_thresholds():
@@ -288,5 +314,27 @@ def delete_action(index):
     # Delete action from your database here
     return jsonify({'success': True})
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return metrics.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+@app.route('/metrics/profiler', methods=['GET'])
+def get_profiler():
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(profiler.top(limit))
+
+@app.route('/metrics/profiler', methods=['POST'])
+def toggle_profiler():
+    # Body: {"enabled": true, "interval": 0.01}
+    data = request.json or {}
+    if data.get('enabled'):
+        try:
+            profiler.start(data.get('interval'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'interval must be a positive number of seconds'}), 400
+    else:
+        profiler.stop()
+    return jsonify(profiler.top(0))
+
 if __name__ == '__main__':
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
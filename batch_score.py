@@ -0,0 +1,237 @@
+"""Offline bulk re-scoring of historical sensor readings.
+
+Reads a CSV either in the ``pollution_dataset.csv`` long shape
+(date, city, coordinateNumber, nameImpurity, value) or already wide
+(one column per parameter), runs the same feature mapping, scaler,
+EnhancedLSTM and risk rules as the live API in large batches across a
+process pool, and writes predictions and risk levels to a Parquet file.
+
+Example:
+    python batch_score.py dataset/pollution_dataset.csv scores.parquet --thresholds new_thresholds.json
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import torch
+
+from risk_rules import (THRESHOLDS, RISK_LEVELS, RISK_STATUS, EXPLOSION_PARAMETERS, DERIVED_FEATURES,
+                        count_threshold_alerts, explosion_risk_flags, determine_risk_levels)
+from train_model import EnhancedLSTM
+
+KEY_COLUMNS = ['date', 'city', 'coordinateNumber']
+
+# Per-process model state, loaded once by init_worker
+feature_columns = None
+model = None
+scaler = None
+city_codes = None
+
+
+def init_worker(model_dir, thresholds, threads):
+    global feature_columns, model, scaler, city_codes
+
+    # Each worker gets its own slice of the CPU instead of fighting over all cores
+    torch.set_num_threads(threads)
+    THRESHOLDS.update(thresholds)
+
+    feature_columns = joblib.load(os.path.join(model_dir, 'feature_columns.pkl'))
+    model = EnhancedLSTM(input_size=len(feature_columns))
+    model.load_state_dict(torch.load(os.path.join(model_dir, 'pollution_model.pth')))
+    model.eval()
+
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    city_encoder = joblib.load(os.path.join(model_dir, 'city_encoder.pkl'))
+    city_codes = {city: code for code, city in enumerate(city_encoder.classes_)}
+
+
+def pivot_readings(chunk, keys):
+    # Same reshaping as train_model.load_and_preprocess_data
+    wide = chunk.pivot_table(index=keys, columns='nameImpurity', values='value', aggfunc='first')
+    wide = wide.reset_index()
+    wide.columns.name = None
+    return wide
+
+
+def read_readings(path, chunksize):
+    """Yield wide frames with one row per reading, streaming the CSV in chunks.
+
+    Long-format files must be grouped by reading (as the dataset export is);
+    rows of the last reading in a chunk are held back so a reading split
+    across chunks is still pivoted as one row. A reading that shows up again
+    after it was emitted raises instead of producing duplicate partial rows.
+    """
+    carry = None
+    keys = None
+    seen = set()
+
+    def pivot_new(rows):
+        wide = pivot_readings(rows, keys)
+        chunk_keys = set(wide[keys].itertuples(index=False, name=None))
+        repeated = chunk_keys & seen
+        if repeated:
+            raise ValueError(f'{path} is not grouped by reading ({", ".join(keys)}); '
+                             f'reading {next(iter(repeated))} appears in more than one place')
+        seen.update(chunk_keys)
+        return wide
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        if 'nameImpurity' not in chunk.columns:
+            if len(chunk):
+                yield chunk
+            continue
+
+        # Rows without a complete key can't be attributed to a reading
+        keys = [col for col in KEY_COLUMNS if col in chunk.columns]
+        chunk = chunk.dropna(subset=keys)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if not len(chunk):
+            continue
+
+        last = chunk[keys].iloc[-1]
+        tail = (chunk[keys] == last).all(axis=1)
+        carry = chunk[tail]
+        chunk = chunk[~tail]
+        if len(chunk):
+            yield pivot_new(chunk)
+
+    if carry is not None and len(carry):
+        yield pivot_new(carry)
+
+
+def prepare_model_inputs(frame):
+    # Vectorized prepare_model_input; temporal features come from the
+    # reading's own date rather than the time of scoring
+    features = pd.DataFrame(0.0, index=frame.index, columns=feature_columns)
+    for col in feature_columns:
+        if col in frame and col not in DERIVED_FEATURES:
+            features[col] = pd.to_numeric(frame[col], errors='coerce').fillna(0)
+
+    dates = pd.to_datetime(frame['date']) if 'date' in frame else pd.Series(pd.Timestamp.now(), index=frame.index)
+    features['month'] = dates.dt.month
+    features['day'] = dates.dt.day
+    features['day_of_week'] = dates.dt.dayofweek
+
+    # Unknown cities get encoding 0, like the live API
+    if 'city' in frame:
+        features['city_encoded'] = frame['city'].map(city_codes).fillna(0)
+
+    return features[feature_columns].to_numpy(dtype=float)
+
+
+def score_chunk(frame):
+    input_scaled = scaler.transform(prepare_model_inputs(frame))
+    input_tensor = torch.from_numpy(input_scaled.astype(np.float32))
+
+    with torch.no_grad():
+        predictions = {k: v.squeeze(1).numpy() for k, v in model(input_tensor).items()}
+
+    readings = frame.apply(pd.to_numeric, errors='coerce')
+    # Like check_thresholds, every thresholded pollutant the reading has is checked
+    pollutant_columns = [col for col in THRESHOLDS
+                         if col not in EXPLOSION_PARAMETERS and col in readings]
+    alert_counts = count_threshold_alerts(readings, pollutant_columns)
+    gas_mixture, temp_pressure = explosion_risk_flags(readings)
+    risk_level = determine_risk_levels(predictions['explosion_risk'], predictions['gas_leak_risk'],
+                                       alert_counts, gas_mixture, temp_pressure)
+
+    result = pd.DataFrame(index=frame.index)
+    for col in KEY_COLUMNS:
+        if col in frame:
+            result[col] = frame[col] if col == 'coordinateNumber' else frame[col].astype(str)
+    for name, values in predictions.items():
+        result[name] = values
+    result['alert_count'] = alert_counts
+    result['gas_mixture_risk'] = gas_mixture
+    result['temp_pressure_risk'] = temp_pressure
+    result['risk_level'] = risk_level
+    result['risk_status'] = [RISK_STATUS[level] for level in risk_level]
+    return result.reset_index(drop=True)
+
+
+def write_chunk(result, writer, output):
+    table = pa.Table.from_pandas(result, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter(output, table.schema)
+    else:
+        table = table.cast(writer.schema)
+    writer.write_table(table)
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-score historical sensor readings in bulk')
+    parser.add_argument('input', help='CSV of readings (pollution_dataset.csv shape or one column per parameter)')
+    parser.add_argument('output', help='Parquet file to write predictions and risk levels to')
+    parser.add_argument('--model-dir', default='models', help='Directory with the model, scaler and encoders')
+    parser.add_argument('--thresholds', help='JSON file of THRESHOLDS overrides to evaluate')
+    parser.add_argument('--chunksize', type=int, default=200000, help='CSV rows read per chunk')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Scoring processes')
+    parser.add_argument('--threads', type=int, default=1, help='Torch threads per process')
+    args = parser.parse_args()
+
+    thresholds = {}
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+
+    start = time.time()
+    total = 0
+    risk_counts = np.zeros(len(RISK_LEVELS), dtype=np.int64)
+    writer = None
+    # Write to a temporary file so a failed run never leaves a partial output behind
+    tmp_output = args.output + '.tmp'
+
+    def collect(future):
+        nonlocal total, writer
+        result = future.result()
+        writer = write_chunk(result, writer, tmp_output)
+        total += len(result)
+        risk_counts[:] += np.bincount(result['risk_level'], minlength=len(RISK_LEVELS))
+        print(f'Scored {total} readings ({time.time() - start:.1f}s)')
+
+    print(f'Scoring {args.input} with {args.workers} workers...')
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(args.model_dir, thresholds, args.threads)) as pool:
+            # Keep a bounded number of chunks in flight and write them in input order
+            pending = deque()
+            for frame in read_readings(args.input, args.chunksize):
+                if not len(frame):
+                    continue
+                pending.append(pool.submit(score_chunk, frame))
+                if len(pending) >= 2 * args.workers:
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp_output, args.output)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+
+    if total == 0:
+        print('No readings found')
+        return
+
+    print(f'\nWrote {total} readings to {args.output} in {time.time() - start:.1f}s')
+    for name, level in RISK_LEVELS.items():
+        print(f'{name}: {risk_counts[level]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Latency buckets in seconds, shared by every histogram
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Shortest sampling interval the profiler accepts, in seconds
+MIN_PROFILER_INTERVAL = 0.001
+
+# Distinct device labels tracked before new devices are folded into "other"
+MAX_DEVICES = 200
+
+HISTOGRAM_HELP = {
+    'http_request_duration_seconds': 'HTTP request latency by endpoint.',
+    'pipeline_stage_seconds': 'Sensor pipeline stage latency by endpoint and device.',
+}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative buckets are built on export)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Linear scan is faster than bisect for this few buckets
+        i = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            i += 1
+        # Plain increments under the GIL; a lost update under heavy
+        # contention only skews one sample, which is fine for monitoring
+        self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Holds per-endpoint request counters and per-stage latency histograms"""
+
+    def __init__(self, max_devices=MAX_DEVICES):
+        self._lock = threading.Lock()
+        self.max_devices = max_devices
+        self.devices = set()
+        self.requests = defaultdict(int)    # (endpoint, method, status) -> count
+        self.readings = defaultdict(int)    # device -> count
+        self.histograms = {}                # (name, labels) -> Histogram
+
+    def device_label(self, device):
+        """Bound label cardinality by reporting devices beyond the cap as other"""
+        if device in self.devices:
+            return device
+        with self._lock:
+            if len(self.devices) < self.max_devices:
+                self.devices.add(device)
+                return device
+        return 'other'
+
+    def _histogram(self, name, labels):
+        key = (name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            # Only creation needs the lock; observations go straight to the histogram
+            with self._lock:
+                hist = self.histograms.setdefault(key, Histogram())
+        return hist
+
+    def observe(self, name, value, **labels):
+        self._histogram(name, tuple(sorted(labels.items()))).observe(value)
+
+    def count_request(self, endpoint, method, status):
+        self.requests[(endpoint, method, status)] += 1
+
+    def count_reading(self, device):
+        self.readings[device] += 1
+
+    @contextmanager
+    def time_stage(self, stage, endpoint, device):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('pipeline_stage_seconds', time.perf_counter() - start,
+                         stage=stage, endpoint=endpoint, device=device)
+
+    def render_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP http_requests_total Total HTTP requests by endpoint, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (endpoint, method, status), value in sorted(dict(self.requests).items()):
+            lines.append(
+                f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",'
+                f'status="{status}"}} {value}'
+            )
+
+        lines += [
+            '# HELP sensor_readings_total Sensor readings processed by device.',
+            '# TYPE sensor_readings_total counter',
+        ]
+        for device, value in sorted(dict(self.readings).items()):
+            lines.append(f'sensor_readings_total{{device="{_escape(device)}"}} {value}')
+
+        by_name = defaultdict(list)
+        for (name, labels), hist in dict(self.histograms).items():
+            by_name[name].append((labels, hist))
+
+        for name in sorted(by_name):
+            lines.append(f'# HELP {name} {HISTOGRAM_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} histogram')
+            for labels, hist in sorted(by_name[name], key=lambda item: item[0]):
+                label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                prefix = label_str + ',' if label_str else ''
+                # Derive every bucket and the count from one snapshot of the
+                # bucket counts so a lost update can't make them disagree
+                counts = list(hist.counts)
+                cumulative = 0
+                for bound, bucket_count in zip(hist.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label_str}}} {hist.total}')
+                lines.append(f'{name}_count{{{label_str}}} {cumulative}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Periodically samples the stacks of all threads and counts hot stacks"""
+
+    def __init__(self, interval=0.01, max_depth=30):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        if interval is not None:
+            interval = float(interval)
+            if not interval > 0:
+                raise ValueError('interval must be a positive number of seconds')
+            # Very short intervals would keep the sampler spinning on the GIL
+            interval = max(interval, MIN_PROFILER_INTERVAL)
+            # The sampler reads the interval on every tick, so a running
+            # profiler picks up the new value without restarting
+            self.interval = interval
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[self._format_stack(frame)] += 1
+            self.samples += 1
+
+    def _format_stack(self, frame):
+        # Walk frames directly instead of using traceback to avoid reading source lines
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            code = frame.f_code
+            frames.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(frames))
+
+    def top(self, limit=20):
+        stacks = Counter(dict(self.stacks))  # snapshot, the sampler keeps writing
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'samples': self.samples,
+            'stacks': [
+                {'stack': stack.split(';'), 'count': count}
+                for stack, count in stacks.most_common(limit)
+            ]
+        }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Shared instances used by the Flask app
+registry = MetricsRegistry()
+profiler = SamplingProfiler()
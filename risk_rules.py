@@ -0,0 +1,145 @@
+from datetime import datetime
+
+import numpy as np
+
+# Define threshold values for different parameters
+THRESHOLDS = {
+    # Original pollutants
+    'Suspended Particles': 0.15,    # mg/m³
+    'Sulfur Dioxide': 0.05,        # mg/m³
+    'Carbon Monoxide': 3.0,        # mg/m³
+    'Nitrogen Dioxide': 0.085,     # mg/m³
+    'Sulfates': 0.025,             # mg/m³
+    
+    # New explosion-related parameters
+    'Methane': 5000,               # ppm
+    'Hydrogen': 4000,              # ppm
+    'Temperature': 60,             # °C
+    'Pressure': 2.0,               # bar
+    'Oxygen_Level': 23.5,          # %
+    'VOC': 100                     # ppm
+}
+
+# Define risk levels
+RISK_LEVELS = {
+    'NORMAL': 0,
+    'ATTENTION': 1,
+    'WARNING': 2,
+    'DANGER': 3,
+    'IMMEDIATE_EVAC': 4
+}
+
+# Reverse lookup from risk level value to its name
+RISK_STATUS = {level: name for name, level in RISK_LEVELS.items()}
+
+# Sensor values the model sees that are reported as explosion parameters;
+# every other non-derived feature column is a pollutant
+EXPLOSION_PARAMETERS = ['Methane', 'Hydrogen', 'Temperature', 'Pressure', 'Oxygen_Level', 'VOC']
+
+# Feature columns the server fills in itself
+DERIVED_FEATURES = ['month', 'day', 'day_of_week', 'city_encoded']
+
+def check_thresholds(data):
+    alerts = []
+    for key, value in data.items():
+        if key in THRESHOLDS and value > THRESHOLDS[key]:
+            alerts.append({
+                'parameter': key,
+                'value': value,
+                'threshold': THRESHOLDS[key],
+                'timestamp': datetime.now().isoformat()
+            })
+    return alerts
+
+def analyze_explosion_risk(data):
+    risks = []
+    
+    # Check for explosive gas mixtures
+    if data.get('Methane', 0) > 0.1 * THRESHOLDS['Methane']:
+        if data.get('Oxygen_Level', 21) > 19.5:  # Sufficient oxygen for combustion
+            risks.append({
+                'type': 'GAS_MIXTURE',
+                'severity': 'HIGH',
+                'description': 'Potentially explosive gas mixture detected'
+            })
+    
+    # Check for temperature-pressure combination
+    if data.get('Temperature', 0) > THRESHOLDS['Temperature'] * 0.8:
+        if data.get('Pressure', 1.0) > THRESHOLDS['Pressure'] * 0.9:
+            risks.append({
+                'type': 'TEMP_PRESSURE',
+                'severity': 'CRITICAL',
+                'description': 'Dangerous temperature-pressure combination'
+            })
+    
+    return risks
+
+def determine_risk_level(predictions, alerts, explosion_risks):
+    risk_level = RISK_LEVELS['NORMAL']
+    
+    # Check predictions
+    if predictions['explosion_risk'] > 0.7 or predictions['gas_leak_risk'] > 0.7:
+        risk_level = max(risk_level, RISK_LEVELS['DANGER'])
+    elif predictions['explosion_risk'] > 0.4 or predictions['gas_leak_risk'] > 0.4:
+        risk_level = max(risk_level, RISK_LEVELS['WARNING'])
+    
+    # Check alerts
+    if len(alerts) > 2:
+        risk_level = max(risk_level, RISK_LEVELS['WARNING'])
+    elif len(alerts) > 0:
+        risk_level = max(risk_level, RISK_LEVELS['ATTENTION'])
+    
+    # Check explosion risks
+    for risk in explosion_risks:
+        if risk['severity'] == 'CRITICAL':
+            risk_level = RISK_LEVELS['IMMEDIATE_EVAC']
+        elif risk['severity'] == 'HIGH':
+            risk_level = max(risk_level, RISK_LEVELS['DANGER'])
+    
+    return risk_level
+
+# Vectorized versions of the rules above, for scoring many readings at once.
+# They take a pandas DataFrame with one column per parameter and must stay in
+# step with the per-reading functions.
+
+def _column(frame, name, default):
+    # A missing column or an empty cell both mean the parameter wasn't reported
+    if name in frame:
+        return frame[name].fillna(default).to_numpy(dtype=float)
+    return np.full(len(frame), default, dtype=float)
+
+def count_threshold_alerts(frame, columns):
+    counts = np.zeros(len(frame), dtype=np.int64)
+    for col in columns:
+        if col in THRESHOLDS and col in frame:
+            counts += frame[col].to_numpy(dtype=float) > THRESHOLDS[col]
+    return counts
+
+def explosion_risk_flags(frame):
+    # Missing values fall back to the same defaults as analyze_explosion_risk
+    gas_mixture = ((_column(frame, 'Methane', 0) > 0.1 * THRESHOLDS['Methane']) &
+                   (_column(frame, 'Oxygen_Level', 21) > 19.5))
+    temp_pressure = ((_column(frame, 'Temperature', 0) > THRESHOLDS['Temperature'] * 0.8) &
+                     (_column(frame, 'Pressure', 1.0) > THRESHOLDS['Pressure'] * 0.9))
+    return gas_mixture, temp_pressure
+
+def determine_risk_levels(explosion_risk, gas_leak_risk, alert_counts, gas_mixture, temp_pressure):
+    risk_level = np.full(len(alert_counts), RISK_LEVELS['NORMAL'], dtype=np.int64)
+    
+    # Check predictions
+    high = (explosion_risk > 0.7) | (gas_leak_risk > 0.7)
+    medium = ~high & ((explosion_risk > 0.4) | (gas_leak_risk > 0.4))
+    risk_level[high] = np.maximum(risk_level[high], RISK_LEVELS['DANGER'])
+    risk_level[medium] = np.maximum(risk_level[medium], RISK_LEVELS['WARNING'])
+    
+    # Check alerts
+    many = alert_counts > 2
+    some = ~many & (alert_counts > 0)
+    risk_level[many] = np.maximum(risk_level[many], RISK_LEVELS['WARNING'])
+    risk_level[some] = np.maximum(risk_level[some], RISK_LEVELS['ATTENTION'])
+    
+    # Check explosion risks (a critical combination always means evacuation)
+    risk_level[gas_mixture] = np.maximum(risk_level[gas_mixture], RISK_LEVELS['DANGER'])
+    risk_level[temp_pressure] = RISK_LEVELS['IMMEDIATE_EVAC']
+    
+    return risk_level
@@ -0,0 +1,107 @@
+import json
+
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+# Use orjson when it is installed, otherwise fall back to the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Types neither encoder handles natively (Decimal, and date/datetime so they
+# keep Flask's HTTP date format) go through Flask's own default hook
+_default = DefaultJSONProvider.default
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS |
+                       orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def dumps_bytes(obj, sort_keys=False, indent=None):
+        # orjson only supports two-space indentation
+        option = _ORJSON_OPTIONS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+else:
+    def dumps_bytes(obj, sort_keys=False, indent=None):
+        separators = None if indent else (',', ':')
+        return json.dumps(obj, default=_default, sort_keys=sort_keys, indent=indent,
+                          separators=separators, ensure_ascii=False).encode('utf-8')
+
+# Incoming JSON is always parsed by the standard library: orjson rejects the
+# NaN/Infinity literals that Python clients send for missing values
+loads = json.loads
+
+
+class RawJSON:
+    """Already-encoded JSON that is spliced into the output instead of re-serialized"""
+
+    __slots__ = ('encoded',)
+
+    def __init__(self, encoded):
+        self.encoded = encoded
+
+
+def encode_fragment(value):
+    """Pre-encode a constant value so it can be spliced into responses"""
+    return RawJSON(dumps_bytes(value))
+
+
+def dumps_with_fragments(obj, fragments):
+    """Serialize a dict and append pre-encoded values for the given keys"""
+    body = dumps_bytes(obj)
+    if not fragments:
+        return body
+    parts = [dumps_bytes(key) + b':' + raw.encoded for key, raw in fragments.items()]
+    separator = b',' if len(body) > 2 else b''
+    return body[:-1] + separator + b','.join(parts) + b'}'
+
+
+class SocketIOJSON:
+    """json module replacement for Socket.IO packets.
+
+    Socket.IO encodes every event as a ``[event, payload]`` list; payloads
+    wrapped in :class:`RawJSON` are spliced in as-is, so a response that was
+    already serialized for HTTP is not serialized again for the broadcast.
+    """
+
+    @staticmethod
+    def dumps(obj, **kwargs):
+        if isinstance(obj, list) and any(isinstance(item, RawJSON) for item in obj):
+            parts = [item.encoded if isinstance(item, RawJSON) else dumps_bytes(item) for item in obj]
+            return (b'[' + b','.join(parts) + b']').decode('utf-8')
+        return dumps_bytes(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return loads(s)
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider backed by the fast serializer.
+
+    ``sort_keys`` and ``indent`` are honoured (keys are sorted by default, as
+    with Flask's own provider); other ``json.dumps`` arguments are ignored.
+    """
+
+    mimetype = 'application/json'
+    sort_keys = True
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys),
+                           indent=kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, sort_keys=self.sort_keys), mimetype=self.mimetype)
+
+
+def json_response(body, status=200):
+    """Build a Flask response from already-encoded JSON bytes"""
+    return current_app.response_class(body, status=status, mimetype='application/json')
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+import torch
+
+from batch_score import read_readings
+from train_model import EnhancedLSTM
+
+
+def test_batched_predictions_match_single_readings():
+    torch.manual_seed(0)
+    model = EnhancedLSTM(input_size=15)
+    model.eval()
+    x = torch.randn(8, 15)
+
+    with torch.no_grad():
+        batched = model(x)
+        for i in range(len(x)):
+            single = model(x[i:i + 1])
+            for name, values in single.items():
+                assert torch.allclose(batched[name][i:i + 1], values, atol=1e-6)
+
+
+def write_long_csv(path, keys):
+    rows = [(date, city, 1, param, value)
+            for date, city in keys
+            for param, value in [('Ammonia', 0.1), ('Carbon Monoxide', 2.0)]]
+    pd.DataFrame(rows, columns=['date', 'city', 'coordinateNumber', 'nameImpurity', 'value']).to_csv(path, index=False)
+
+
+def test_readings_split_across_chunks_are_pivoted_once(tmp_path):
+    path = tmp_path / 'history.csv'
+    keys = [(f'2024-01-0{day}', city) for day in range(1, 6) for city in ['A', 'B']]
+    write_long_csv(path, keys)
+
+    frames = list(read_readings(path, chunksize=3))
+    readings = pd.concat(frames, ignore_index=True)
+
+    assert len(readings) == len(keys)
+    assert not readings.duplicated(['date', 'city', 'coordinateNumber']).any()
+    assert (readings['Carbon Monoxide'] == 2.0).all()
+
+
+def test_ungrouped_long_csv_fails_loudly(tmp_path):
+    path = tmp_path / 'history.csv'
+    write_long_csv(path, [('2024-01-01', 'A'), ('2024-01-02', 'A'), ('2024-01-01', 'A')])
+
+    with pytest.raises(ValueError, match='not grouped by reading'):
+        list(read_readings(path, chunksize=2))
+
+
+def test_rows_without_a_key_are_skipped(tmp_path):
+    path = tmp_path / 'history.csv'
+    write_long_csv(path, [('2024-01-01', 'A'), ('2024-01-02', 'A')])
+    with open(path, 'a') as f:
+        f.write('2024-01-03,,1,Ammonia,0.1\n')
+
+    frames = list(read_readings(path, chunksize=2))
+
+    assert all(len(frame) for frame in frames)
+    assert len(pd.concat(frames)) == 2
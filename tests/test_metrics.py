@@ -0,0 +1,64 @@
+import time
+
+from metrics import LATENCY_BUCKETS, MetricsRegistry, SamplingProfiler
+
+
+def bucket_values(text, prefix):
+    return [int(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(prefix)]
+
+
+def test_histogram_buckets_are_cumulative_and_end_with_count():
+    registry = MetricsRegistry()
+    for value in (0.00005, 0.003, 0.003, 0.2, 10.0):
+        registry.observe('pipeline_stage_seconds', value, stage='scaling')
+
+    text = registry.render_prometheus()
+    buckets = bucket_values(text, 'pipeline_stage_seconds_bucket')
+
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 5
+    assert 'pipeline_stage_seconds_bucket{stage="scaling",le="+Inf"} 5' in text
+    assert 'pipeline_stage_seconds_count{stage="scaling"} 5' in text
+
+
+def test_inf_bucket_never_drops_below_finite_buckets():
+    registry = MetricsRegistry()
+    registry.observe('pipeline_stage_seconds', 0.001, stage='emit')
+    # Simulate a lost update on the running count
+    next(iter(registry.histograms.values())).count = 0
+
+    buckets = bucket_values(registry.render_prometheus(), 'pipeline_stage_seconds_bucket')
+
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == 1
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.count_reading('line\nbreak "quoted" back\\slash')
+
+    text = registry.render_prometheus()
+
+    assert 'sensor_readings_total{device="line\\nbreak \\"quoted\\" back\\\\slash"} 1' in text
+
+
+def test_devices_beyond_the_cap_are_folded_into_other():
+    registry = MetricsRegistry(max_devices=2)
+    for device in ['a', 'b', 'c', 'd', 'a']:
+        registry.count_reading(registry.device_label(device))
+
+    assert dict(registry.readings) == {'a': 2, 'b': 1, 'other': 2}
+
+
+def test_running_profiler_takes_new_interval():
+    profiler = SamplingProfiler(interval=0.01)
+    profiler.start()
+    try:
+        profiler.start(0.002)
+        assert profiler.running
+        assert profiler.interval == 0.002
+        time.sleep(0.05)
+    finally:
+        profiler.stop()
+    assert profiler.samples > 0
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from risk_rules import (THRESHOLDS, analyze_explosion_risk, check_thresholds, count_threshold_alerts,
+                        determine_risk_level, determine_risk_levels, explosion_risk_flags)
+
+POLLUTANTS = ['Suspended Particles', 'Sulfur Dioxide', 'Carbon Monoxide', 'Nitrogen Dioxide', 'Sulfates']
+EXPLOSION = ['Methane', 'Oxygen_Level', 'Temperature', 'Pressure']
+
+
+def random_readings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({col: rng.uniform(0, 2 * THRESHOLDS[col], n) for col in POLLUTANTS})
+    frame['Methane'] = rng.uniform(0, 1000, n)
+    frame['Oxygen_Level'] = rng.uniform(18, 22, n)
+    frame['Temperature'] = rng.uniform(30, 70, n)
+    frame['Pressure'] = rng.uniform(0.5, 2.5, n)
+    # Knock out some cells so unreported values are exercised too
+    return frame.mask(rng.random(frame.shape) < 0.2)
+
+
+def reported(row, columns):
+    # What a live JSON reading would contain: only the values that are present
+    return {col: row[col] for col in columns if not pd.isna(row[col])}
+
+
+def test_vectorized_rules_match_per_reading_rules():
+    frame = random_readings(2000)
+    rng = np.random.default_rng(1)
+    explosion_risk = rng.uniform(0, 1, len(frame))
+    gas_leak_risk = rng.uniform(0, 1, len(frame))
+
+    alert_counts = count_threshold_alerts(frame, POLLUTANTS)
+    gas_mixture, temp_pressure = explosion_risk_flags(frame)
+    levels = determine_risk_levels(explosion_risk, gas_leak_risk, alert_counts, gas_mixture, temp_pressure)
+
+    for i, row in frame.iterrows():
+        alerts = check_thresholds(reported(row, POLLUTANTS))
+        risks = analyze_explosion_risk(reported(row, EXPLOSION))
+        predictions = {'explosion_risk': explosion_risk[i], 'gas_leak_risk': gas_leak_risk[i]}
+
+        assert alert_counts[i] == len(alerts)
+        assert gas_mixture[i] == any(r['type'] == 'GAS_MIXTURE' for r in risks)
+        assert temp_pressure[i] == any(r['type'] == 'TEMP_PRESSURE' for r in risks)
+        assert levels[i] == determine_risk_level(predictions, alerts, risks)
+
+
+def test_missing_oxygen_uses_live_default():
+    frame = pd.DataFrame({'Methane': [1000.0], 'Oxygen_Level': [np.nan]})
+    gas_mixture, _ = explosion_risk_flags(frame)
+    assert gas_mixture[0]
+    assert analyze_explosion_risk({'Methane': 1000.0})[0]['type'] == 'GAS_MIXTURE'
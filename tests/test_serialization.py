@@ -0,0 +1,59 @@
+import json
+
+from flask import Flask
+from flask_socketio import SocketIO
+
+from serialization import (FastJSONProvider, RawJSON, SocketIOJSON, dumps_bytes, dumps_with_fragments,
+                           encode_fragment)
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def test_spliced_body_matches_merged_dict():
+    obj = {'timestamp': '2024-01-01T00:00:00', 'risk_level': 2, 'predictions': {'gas_leak_risk': 0.5}}
+    fragments = {'risk_status': 'WARNING', 'recommended_actions': ['Check "vents"', 'Évacuer']}
+
+    body = dumps_with_fragments(obj, {key: encode_fragment(value) for key, value in fragments.items()})
+
+    assert body == stdlib_dumps({**obj, **fragments})
+
+
+def test_spliced_body_from_empty_dict():
+    body = dumps_with_fragments({}, {'risk_status': encode_fragment('NORMAL')})
+
+    assert body == stdlib_dumps({'risk_status': 'NORMAL'})
+    assert dumps_with_fragments({}, {}) == b'{}'
+
+
+def test_raw_payload_survives_socketio_broadcast():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    socketio = SocketIO(app, json=SocketIOJSON)
+    payload = {'risk_status': 'DANGER', 'alerts': [{'parameter': 'Methane', 'value': 5100.5}], 'city': 'Київ'}
+
+    client = socketio.test_client(app)
+    socketio.emit('sensor_update', RawJSON(dumps_bytes(payload)))
+    received = client.get_received()
+
+    assert received == [{'name': 'sensor_update', 'args': [payload], 'namespace': '/'}]
+
+
+def test_jsonify_sorts_keys_like_flask():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    with app.app_context():
+        assert app.json.dumps({'b': 1, 'a': 2}) == '{"a":2,"b":1}'
+        assert app.json.response({'b': 1, 'a': 2}).get_data() == b'{"a":2,"b":1}'
+
+
+def test_non_finite_numbers_are_accepted_on_input():
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+
+    data = app.json.loads('{"Methane": NaN, "VOC": 1e400}')
+
+    assert data['Methane'] != data['Methane']
+    assert data['VOC'] == float('inf')
@@ -0,0 +1,106 @@
+import math
+import os
+
+import msgpack
+import pytest
+
+from wire_format import UNKNOWN_CITY, StructCodec, validate_reading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FEATURES = ['Ammonia', 'Carbon Monoxide', 'Methane', 'Oxygen_Level', 'month', 'day', 'day_of_week',
+            'city_encoded']
+THRESHOLDS = {'Carbon Monoxide': 3.0, 'Sulfates': 0.025, 'Methane': 5000}
+
+
+def test_struct_round_trip():
+    codec = StructCodec(FEATURES, ['Kyiv', 'Lviv'], THRESHOLDS)
+    reading = {
+        'pollutants': {'Carbon Monoxide': 3.1, 'Sulfates': 0.025},
+        'explosion_parameters': {'Methane': 4500.0, 'Oxygen_Level': 21.0},
+        'city': 'Lviv'
+    }
+
+    assert codec.fields == ['Ammonia', 'Carbon Monoxide', 'Methane', 'Oxygen_Level', 'Sulfates']
+    assert codec.decode(codec.encode(reading)) == reading
+
+
+def test_struct_unreported_values_and_unknown_city():
+    codec = StructCodec(FEATURES, ['Kyiv'], THRESHOLDS)
+    body = codec.encode({'pollutants': {'Ammonia': math.nan}, 'city': 'Atlantis'})
+
+    assert int.from_bytes(body[:2], 'little') == UNKNOWN_CITY
+    assert codec.decode(body) == {'pollutants': {}, 'explosion_parameters': {}}
+
+
+def test_struct_rejects_wrong_size():
+    codec = StructCodec(FEATURES, ['Kyiv'], THRESHOLDS)
+    with pytest.raises(ValueError):
+        codec.decode(codec.encode({})[:-1])
+
+
+@pytest.mark.parametrize('reading', [
+    5,
+    [1, 2],
+    {'pollutants': [1]},
+    {'explosion_parameters': 'hot'},
+    {'pollutants': {'Carbon Monoxide': None}},
+    {'pollutants': {'Carbon Monoxide': b'3'}},
+    {'pollutants': {'Carbon Monoxide': '3'}},
+    {'explosion_parameters': {'Methane': True}},
+])
+def test_validate_reading_rejects_bad_shapes(reading):
+    with pytest.raises(ValueError):
+        validate_reading(reading)
+
+
+def test_validate_reading_accepts_numbers():
+    reading = {'pollutants': {'Carbon Monoxide': 3}, 'explosion_parameters': {'Methane': 4500.5}}
+    assert validate_reading(reading) is reading
+
+
+@pytest.fixture(scope='module')
+def live_app():
+    # app.py loads its model files relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(cwd)
+
+
+def without_timestamps(response):
+    response = dict(response)
+    response.pop('timestamp')
+    response['alerts'] = [{k: v for k, v in alert.items() if k != 'timestamp'} for alert in response['alerts']]
+    return response
+
+
+def test_binary_uploads_match_json_upload(live_app):
+    client = live_app.app.test_client()
+    city = live_app.struct_codec.cities[0]
+    reading = {
+        'pollutants': {'Carbon Monoxide': 3.5, 'Suspended Particles': 0.3, 'Sulfates': 0.025},
+        'explosion_parameters': {'Methane': 4500.0, 'Temperature': 55.0, 'Pressure': 1.9},
+        'city': city
+    }
+
+    json_response = client.post('/api/sensor-data', json=reading)
+    msgpack_response = client.post('/api/sensor-data', data=msgpack.packb(reading),
+                                   content_type='application/msgpack')
+    struct_response = client.post('/api/sensor-data', data=live_app.struct_codec.encode(reading),
+                                  content_type='application/x-sensor-struct')
+
+    assert json_response.status_code == msgpack_response.status_code == struct_response.status_code == 200
+    expected = without_timestamps(json_response.get_json())
+    assert len(expected['alerts']) == 2
+    assert without_timestamps(msgpack_response.get_json()) == expected
+    assert without_timestamps(struct_response.get_json()) == expected
+
+
+def test_bad_msgpack_upload_is_rejected(live_app):
+    client = live_app.app.test_client()
+    response = client.post('/api/sensor-data', data=msgpack.packb(5), content_type='application/msgpack')
+    assert response.status_code == 400
@@ -21,8 +21,9 @@ class EnhancedLSTM(nn.Module):
         self.explosion_head = nn.Linear(128, 1)  # Explosion risk
         self.gas_leak_head = nn.Linear(128, 1)  # Gas leak risk
         
-        # Attention mechanism for parameter relationships
-        self.attention = nn.MultiheadAttention(128, 4)
+        # Attention mechanism for parameter relationships; batch_first so
+        # readings in a batch are scored independently of each other
+        self.attention = nn.MultiheadAttention(128, 4, batch_first=True)
         
     def forward(self, x):
         # Reshape input for LSTM if necessary
@@ -0,0 +1,108 @@
+import math
+import struct
+
+from risk_rules import EXPLOSION_PARAMETERS, DERIVED_FEATURES
+
+# MessagePack support is optional
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_CONTENT_TYPE = 'application/json'
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+STRUCT_CONTENT_TYPE = 'application/x-sensor-struct'
+
+UNKNOWN_CITY = 0xFFFF
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def wire_format_for(content_type):
+    """Map a request content type to one of 'json', 'msgpack' or 'struct'"""
+    mimetype = (content_type or JSON_CONTENT_TYPE).split(';')[0].strip().lower()
+    if mimetype in MSGPACK_CONTENT_TYPES:
+        if msgpack is None:
+            raise UnsupportedFormat('MessagePack support is not installed on the server')
+        return 'msgpack'
+    if mimetype == STRUCT_CONTENT_TYPE:
+        return 'struct'
+    return 'json'
+
+
+def unpack_msgpack(body):
+    return msgpack.unpackb(body, raw=False)
+
+
+def pack_msgpack(obj):
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def validate_reading(data):
+    """Check a decoded reading has the shape the pipeline expects"""
+    if not isinstance(data, dict):
+        raise ValueError('reading must be a map')
+    for category in ('pollutants', 'explosion_parameters'):
+        values = data.get(category, {})
+        if not isinstance(values, dict):
+            raise ValueError(f'{category} must be a map')
+        for param, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ValueError(f'{category}.{param} must be a number')
+    return data
+
+
+class StructCodec:
+    """Fixed-layout binary reading: a uint16 city index followed by one
+    float64 per sensor value, little-endian, in ``fields`` order.
+
+    Fields are the model's sensor columns followed by any other thresholded
+    parameter, so everything the rules check can be sent. NaN marks a value
+    the sensor did not report; it is left out of the decoded reading, as it
+    would be in JSON. The city index refers to the city encoder's classes;
+    ``0xFFFF`` means unknown. Values are split back into ``pollutants`` and
+    ``explosion_parameters`` so decoded readings look exactly like JSON ones.
+    """
+
+    def __init__(self, feature_columns, cities, thresholds=()):
+        self.fields = [col for col in feature_columns if col not in DERIVED_FEATURES]
+        self.fields += [param for param in thresholds if param not in self.fields]
+        self.cities = [str(city) for city in cities]
+        self.struct = struct.Struct('<H' + 'd' * len(self.fields))
+        self._explosion = [field in EXPLOSION_PARAMETERS for field in self.fields]
+
+    def layout(self):
+        return {
+            'content_type': STRUCT_CONTENT_TYPE,
+            'format': self.struct.format,
+            'size': self.struct.size,
+            'fields': ['city_index'] + self.fields,
+            'explosion_parameters': [field for field in self.fields if field in EXPLOSION_PARAMETERS],
+            'missing_value': 'NaN',
+            'cities': self.cities
+        }
+
+    def decode(self, body):
+        if len(body) != self.struct.size:
+            raise ValueError(f'Expected {self.struct.size} bytes, got {len(body)}')
+        city_index, *values = self.struct.unpack(body)
+        data = {'pollutants': {}, 'explosion_parameters': {}}
+        for field, is_explosion, value in zip(self.fields, self._explosion, values):
+            if not math.isnan(value):
+                data['explosion_parameters' if is_explosion else 'pollutants'][field] = value
+        if city_index < len(self.cities):
+            data['city'] = self.cities[city_index]
+        return data
+
+    def encode(self, data):
+        values = []
+        for field, is_explosion in zip(self.fields, self._explosion):
+            category = data.get('explosion_parameters' if is_explosion else 'pollutants', {})
+            values.append(float(category.get(field, math.nan)))
+        try:
+            city_index = self.cities.index(data.get('city'))
+        except ValueError:
+            city_index = UNKNOWN_CITY
+        return self.struct.pack(city_index, *values)